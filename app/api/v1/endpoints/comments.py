@@ -1,16 +1,21 @@
 from app.utils.queues import COMMENT_ANALYSIS_QUEUE
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timedelta
+import csv
+import io
 import json
+import logging
 import os
+import time
+import zlib
 
-from app.database import get_db
-from app.models import Comment, CommentAnalysis, User
+from app.database import get_db, get_read_db, read_session
+from app.models import AnalysisModel, Comment, CommentAnalysis, User
 from app.schemas import (
     CommentCreate,
     CommentResponse,
@@ -19,9 +24,17 @@ from app.schemas import (
 )
 from app.rabbitmq import publish_message
 from app.utils.toxicity_analyzer import analyze_toxicity
+from app.utils.rate_limit import rate_limiter
+from app.utils.partitions import MAX_ANALYSIS_DELAY
+from app.utils.analysis_models import unpack_scores
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Filas que se traen del cursor del servidor en cada viaje
+EXPORT_BATCH_SIZE = 1000
+
 # Configurar templates
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "../../../templates"))
 
@@ -29,12 +42,27 @@ templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), ".
 async def get_dashboard():
     return templates.TemplateResponse("index.html", {"request": {}})
 
+def analysis_window(days: int) -> list:
+    """
+    Condiciones para los últimos `days` días sobre ambas tablas particionadas:
+    sin la cota en comments.created_at el join probaría todas sus particiones.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    return [
+        CommentAnalysis.analyzed_at >= since,
+        Comment.created_at >= since - MAX_ANALYSIS_DELAY
+    ]
+
 @router.get("/recent", summary="Get recent analyzed comments")
-async def get_recent_comments(db: AsyncSession = Depends(get_db)):
+async def get_recent_comments(
+    db: AsyncSession = Depends(get_read_db),
+    days: int = Query(7, ge=1, le=90)
+):
     result = await db.execute(
         select(Comment, CommentAnalysis, User)
         .join(CommentAnalysis, Comment.id == CommentAnalysis.comment_id)
         .join(User, Comment.user_id == User.id)
+        .where(*analysis_window(days))
         .order_by(CommentAnalysis.analyzed_at.desc())
         .limit(20)
     )
@@ -59,7 +87,7 @@ async def get_recent_comments(db: AsyncSession = Depends(get_db)):
     return comments
 
 @router.get("/stats", summary="Get toxicity statistics")
-async def get_toxicity_stats(db: AsyncSession = Depends(get_db)):
+async def get_toxicity_stats(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(
             func.sum(case((CommentAnalysis.classification == "non-toxic", 1), else_=0)).label("non_toxic"),
@@ -75,6 +103,170 @@ async def get_toxicity_stats(db: AsyncSession = Depends(get_db)):
         "toxic": stats.toxic or 0
     }
 
+@router.get("/stats/labels", summary="Get average score per model label")
+async def get_label_stats(db: AsyncSession = Depends(get_read_db)):
+    models = (await db.execute(select(AnalysisModel))).scalars().all()
+
+    stats = []
+    for model in models:
+        # scores es un real[] en el orden de model.labels (índices de PostgreSQL, base 1)
+        result = await db.execute(
+            select(
+                func.count(CommentAnalysis.id),
+                *[func.avg(CommentAnalysis.scores[i + 1]) for i in range(len(model.labels))]
+            )
+            .where(CommentAnalysis.model_id == model.id)
+        )
+        count, *averages = result.first()
+        stats.append({
+            "model": model.name,
+            "analyses": count,
+            "average_scores": {
+                label: round(avg, 4) if avg is not None else None
+                for label, avg in zip(model.labels, averages)
+            }
+        })
+
+    return stats
+
+@router.get("/raids", summary="Get clusters of near-duplicate comments")
+async def get_raid_clusters(
+    db: AsyncSession = Depends(get_read_db),
+    hours: int = Query(24, ge=1, le=720),
+    min_size: int = Query(5, ge=2)
+):
+    # El worker marca las copias con analysis_result.duplicate_of
+    duplicate_of = CommentAnalysis.analysis_result["duplicate_of"].as_integer()
+    since = datetime.utcnow() - timedelta(hours=hours)
+
+    result = await db.execute(
+        select(
+            duplicate_of.label("comment_id"),
+            func.count(CommentAnalysis.id).label("duplicates"),
+            func.min(CommentAnalysis.analyzed_at).label("first_seen"),
+            func.max(CommentAnalysis.analyzed_at).label("last_seen")
+        )
+        .where(
+            CommentAnalysis.analyzed_at >= since,
+            duplicate_of.isnot(None)
+        )
+        .group_by(duplicate_of)
+        .having(func.count(CommentAnalysis.id) + 1 >= min_size)
+        .order_by(func.count(CommentAnalysis.id).desc())
+        .limit(50)
+    )
+
+    return [
+        {
+            "comment_id": row.comment_id,
+            "duplicates": row.duplicates,
+            "first_seen": row.first_seen,
+            "last_seen": row.last_seen
+        }
+        for row in result
+    ]
+
+EXPORT_COLUMNS = [
+    "id", "text", "user_id", "username", "created_at",
+    "toxicity_score", "classification", "model", "analyzed_at"
+]
+
+def export_query(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    classification: Optional[List[str]],
+    user_id: Optional[int]
+):
+    query = (
+        select(
+            Comment.id,
+            Comment.text,
+            Comment.user_id,
+            User.username,
+            Comment.created_at,
+            CommentAnalysis.toxicity_score,
+            CommentAnalysis.classification,
+            AnalysisModel.name,
+            CommentAnalysis.analyzed_at
+        )
+        .join(CommentAnalysis, Comment.id == CommentAnalysis.comment_id)
+        .join(User, Comment.user_id == User.id)
+        .outerjoin(AnalysisModel, AnalysisModel.id == CommentAnalysis.model_id)
+        .order_by(Comment.id)
+    )
+
+    if since:
+        # analyzed_at >= created_at, así que el filtro también poda comment_analysis
+        query = query.where(Comment.created_at >= since, CommentAnalysis.analyzed_at >= since)
+    if until:
+        query = query.where(Comment.created_at < until)
+    if classification:
+        query = query.where(CommentAnalysis.classification.in_(classification))
+    if user_id is not None:
+        query = query.where(Comment.user_id == user_id)
+
+    return query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def format_rows(rows, output_format: str) -> str:
+    if output_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=lambda value: value.isoformat(), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+async def stream_export(query, output_format: str, compress: bool):
+    # zlib con wbits=31 produce un flujo gzip válido trozo a trozo
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    started = time.monotonic()
+    exported = 0
+
+    def encode(chunk: str) -> bytes:
+        data = chunk.encode()
+        return compressor.compress(data) if compressor else data
+
+    if output_format == "csv":
+        yield encode(",".join(EXPORT_COLUMNS) + "\n")
+
+    # Sesión propia (en una réplica si hay): el cursor del servidor vive mientras dura la respuesta
+    async with read_session() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            exported += len(rows)
+            yield encode(format_rows(rows, output_format))
+
+    if compressor:
+        yield compressor.flush()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Exported {exported} rows in {elapsed:.1f}s ({exported / max(elapsed, 1e-6):.0f} rows/s)")
+
+@router.get("/export", summary="Stream comments with their analyses as NDJSON or CSV")
+async def export_comments(
+    output_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    classification: Optional[List[str]] = Query(None),
+    user_id: Optional[int] = None,
+    gzip: bool = False
+):
+    query = export_query(since, until, classification, user_id)
+
+    filename = f"comments.{output_format}"
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        stream_export(query, output_format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.post(
     "/",
     response_model=CommentResponse,
@@ -83,6 +275,15 @@ async def get_toxicity_stats(db: AsyncSession = Depends(get_db)):
     description="Creates a new comment and queues it for toxicity analysis"
 )
 async def create_comment(comment: CommentCreate, db: AsyncSession = Depends(get_db)):
+    # Rate limiting antes de tocar la base de datos
+    retry_after = await rate_limiter.check(comment.user_id)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many comments, slow down",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
     # Check if user exists
     user = await db.get(User, comment.user_id)
     if not user:
@@ -126,8 +327,17 @@ async def create_comment(comment: CommentCreate, db: AsyncSession = Depends(get_
     summary="Get comment details",
     description="Retrieves details for a specific comment"
 )
-async def get_comment(comment_id: int, db: AsyncSession = Depends(get_db)):
-    comment = await db.get(Comment, comment_id)
+async def get_comment(
+    comment_id: int,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db)
+):
+    # Comment tiene clave primaria compuesta (id, created_at) por el particionado
+    query = select(Comment).where(Comment.id == comment_id)
+    comment = (await read_db.execute(query)).scalar_one_or_none()
+    if not comment:
+        # Puede que la réplica aún no tenga un comentario recién creado
+        comment = (await db.execute(query)).scalar_one_or_none()
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -141,18 +351,37 @@ async def get_comment(comment_id: int, db: AsyncSession = Depends(get_db)):
     summary="Get comment analysis",
     description="Retrieves toxicity analysis results for a comment"
 )
-async def get_comment_analysis(comment_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(CommentAnalysis).where(CommentAnalysis.comment_id == comment_id)
+async def get_comment_analysis(
+    comment_id: int,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db)
+):
+    query = (
+        select(CommentAnalysis, AnalysisModel.name, AnalysisModel.labels)
+        .outerjoin(AnalysisModel, AnalysisModel.id == CommentAnalysis.model_id)
+        .where(CommentAnalysis.comment_id == comment_id)
     )
-    analysis = result.scalar_one_or_none()
+    row = (await read_db.execute(query)).one_or_none()
+    if not row:
+        # El análisis recién guardado por el worker puede no haber llegado a la réplica
+        row = (await db.execute(query)).one_or_none()
     
-    if not analysis:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Analysis not found for this comment"
         )
-    return analysis
+
+    analysis, model_name, labels = row
+    return CommentAnalysisResponse(
+        id=analysis.id,
+        comment_id=analysis.comment_id,
+        toxicity_score=analysis.toxicity_score,
+        classification=analysis.classification,
+        analyzed_at=analysis.analyzed_at,
+        model=model_name,
+        scores=unpack_scores(labels or [], analysis.scores)
+    )
 
 @router.get(
     "/{comment_id}/user-status",
@@ -161,7 +390,9 @@ async def get_comment_analysis(comment_id: int, db: AsyncSession = Depends(get_d
     description="Retrieves moderation status for the user who made the comment"
 )
 async def get_user_status(comment_id: int, db: AsyncSession = Depends(get_db)):
-    comment = await db.get(Comment, comment_id)
+    # Siempre en la primaria: el cliente la consulta justo después de comentar para ver si fue bloqueado
+    result = await db.execute(select(Comment).where(Comment.id == comment_id))
+    comment = result.scalar_one_or_none()
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -184,12 +415,19 @@ async def get_user_status(comment_id: int, db: AsyncSession = Depends(get_db)):
 
 @router.get("/all", summary="Get all comments with pagination")
 async def get_all_comments(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     page: int = Query(1, ge=1),
-    per_page: int = Query(10, ge=1, le=100)
+    per_page: int = Query(10, ge=1, le=100),
+    days: int = Query(30, ge=1, le=365)
 ):
-    # Contar total de comentarios
-    total_result = await db.execute(select(func.count(Comment.id)))
+    window = analysis_window(days)
+
+    # Contar total de comentarios analizados en la ventana
+    total_result = await db.execute(
+        select(func.count(Comment.id))
+        .join(CommentAnalysis, Comment.id == CommentAnalysis.comment_id)
+        .where(*window)
+    )
     total = total_result.scalar()
     
     # Obtener comentarios paginados
@@ -198,6 +436,7 @@ async def get_all_comments(
         select(Comment, CommentAnalysis, User)
         .join(CommentAnalysis, Comment.id == CommentAnalysis.comment_id)
         .join(User, Comment.user_id == User.id)
+        .where(*window)
         .order_by(CommentAnalysis.analyzed_at.desc())
         .offset(offset)
         .limit(per_page)
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import User
 from app.schemas import UserCreate, UserResponse
-from app.database import get_db
+from app.database import get_db, get_read_db
 
 router = APIRouter()
 
@@ -38,7 +38,7 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     return db_user
 
 @router.get("/blocked", summary="Get currently blocked users")
-async def get_blocked_users(db: AsyncSession = Depends(get_db)):
+async def get_blocked_users(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(User)
         .where(and_(
@@ -60,7 +60,7 @@ async def get_blocked_users(db: AsyncSession = Depends(get_db)):
     ]
 
 @router.get("/blocked", summary="Get currently blocked users")
-async def get_blocked_users(db: AsyncSession = Depends(get_db)):
+async def get_blocked_users(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(User)
         .where(User.is_blocked == True)
@@ -1,16 +1,133 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, ForeignKey, text
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
+import itertools
+import logging
+import time
 from .utils.config import settings
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=True,
+    pool_size=settings.POSTGRES_PRIMARY_POOL_SIZE,
+    max_overflow=settings.POSTGRES_PRIMARY_MAX_OVERFLOW
+)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+REPLICA_URLS = [url.strip() for url in (settings.POSTGRES_REPLICA_URLS or "").split(",") if url.strip()]
+
+replica_engines = [
+    create_async_engine(
+        url,
+        echo=True,
+        pool_size=settings.POSTGRES_REPLICA_POOL_SIZE,
+        max_overflow=settings.POSTGRES_REPLICA_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        # Una réplica caída no debe dejar colgado el pool (ni la medición del retraso)
+        connect_args={"timeout": settings.POSTGRES_REPLICA_CONNECT_TIMEOUT_SECONDS}
+    )
+    for url in REPLICA_URLS
+]
+
 Base = declarative_base()
 
+# 0 si la réplica ha aplicado todo lo recibido; si no, antigüedad de la última transacción aplicada
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaRouter:
+    """
+    Reparte las lecturas entre las réplicas en round robin, saltándose las
+    que no responden o cuyo retraso supera POSTGRES_REPLICA_MAX_LAG_SECONDS.
+
+    El retraso se mide en una tarea de fondo (`start`) cada
+    POSTGRES_REPLICA_LAG_CHECK_SECONDS; `pick` sólo lee el último valor, así
+    que una réplica lenta o caída nunca añade latencia a una petición. Hasta
+    la primera medición, o si la medición se queda atrás, se lee de la primaria.
+    """
+
+    def __init__(self, engines: list):
+        self.engines = engines
+        self.lag = {}  # índice -> (medido_en, retraso en segundos)
+        self.next_index = itertools.cycle(range(len(engines))) if engines else None
+        self.task = None
+
+    async def _measure(self, index: int):
+        try:
+            async with self.engines[index].connect() as conn:
+                result = await asyncio.wait_for(
+                    conn.execute(REPLICA_LAG_SQL),
+                    settings.POSTGRES_REPLICA_CONNECT_TIMEOUT_SECONDS
+                )
+                lag = float(result.scalar() or 0)
+        except Exception as e:
+            logger.warning(f"Replica {index} unavailable: {e!r}")
+            lag = float("inf")
+
+        self.lag[index] = (time.monotonic(), lag)
+
+    async def refresh(self):
+        await asyncio.gather(*(self._measure(index) for index in range(len(self.engines))))
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(settings.POSTGRES_REPLICA_LAG_CHECK_SECONDS)
+
+    def start(self):
+        """Lanza la medición periódica del retraso (una vez por proceso)."""
+        if self.engines and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def _healthy(self, index: int) -> bool:
+        checked_at, lag = self.lag.get(index, (0.0, float("inf")))
+        # Una medición vieja (tarea parada o atascada) no cuenta como sana
+        fresh = time.monotonic() - checked_at < 3 * settings.POSTGRES_REPLICA_LAG_CHECK_SECONDS
+        return fresh and lag <= settings.POSTGRES_REPLICA_MAX_LAG_SECONDS
+
+    def pick(self):
+        """Devuelve el engine de una réplica sana, o None para leer de la primaria."""
+        for _ in range(len(self.engines)):
+            index = next(self.next_index)
+            if self._healthy(index):
+                return self.engines[index]
+        return None
+
+replica_router = ReplicaRouter(replica_engines)
+
 async def get_db():
     async with AsyncSessionLocal() as db:
         yield db
+
+@asynccontextmanager
+async def read_session():
+    """Sesión de solo lectura en una réplica, o en la primaria si no hay ninguna disponible."""
+    replica = replica_router.pick()
+    if replica is None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        async with AsyncSession(replica, expire_on_commit=False) as db:
+            yield db
+
+async def get_read_db():
+    async with read_session() as db:
+        yield db
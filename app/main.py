@@ -4,8 +4,11 @@ from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-from app.database import engine, Base
+from app.database import engine, Base, replica_router
 from app.api.v1.endpoints import comments, users
+from app.utils.config import settings
+from app.utils.partitions import ensure_partitions
+from app.utils.rate_limit import rejected_requests
 
 # Crea la instancia de FastAPI
 app = FastAPI(
@@ -48,6 +51,26 @@ async def startup():
         await conn.run_sync(Base.metadata.create_all)
     print("Database tables created (if not exists)")
 
+    # Particiones mensuales para el mes actual y los siguientes
+    try:
+        async with engine.begin() as conn:
+            await ensure_partitions(conn, settings.PARTITION_MONTHS_AHEAD)
+    except Exception as e:
+        print(f"Could not create partitions ({e}); run scripts/partition_tables.py to migrate legacy tables")
+
+    # Medición del retraso de las réplicas en segundo plano
+    replica_router.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await replica_router.stop()
+
 @app.get("/api/health", tags=["health"])
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/api/metrics", tags=["health"])
+async def metrics():
+    return {
+        "rate_limit_rejected": dict(rejected_requests)
+    }
@@ -1,6 +1,7 @@
 from datetime import datetime
 from .database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import ARRAY, REAL
 from sqlalchemy.sql import func
 
 class User(Base):
@@ -16,21 +17,36 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     metadata_ = Column(JSON, nullable=True)  # Additional user metadata
 
+class AnalysisModel(Base):
+    __tablename__ = "analysis_models"
+    
+    id = Column(SmallInteger, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)  # e.g. "unitary/toxic-bert"
+    labels = Column(ARRAY(String), nullable=False)  # Order of the values in CommentAnalysis.scores
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# comments y comment_analysis se particionan por mes (ver app/utils/partitions.py).
+# La clave de partición debe formar parte de la clave primaria, por eso ambas
+# tablas usan (id, fecha) y comment_analysis no puede tener FK hacia comments.
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     text = Column(String, nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 class CommentAnalysis(Base):
     __tablename__ = "comment_analysis"
+    __table_args__ = {"postgresql_partition_by": "RANGE (analyzed_at)"}
     
-    id = Column(Integer, primary_key=True, index=True)
-    comment_id = Column(Integer, ForeignKey("comments.id"))
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    comment_id = Column(Integer, index=True)  # comments.id (sin FK por el particionado)
     toxicity_score = Column(Integer)  # Score from 0 to 100
     classification = Column(String)  # "non-toxic", "potentially-toxic", "toxic"
-    analysis_result = Column(JSON)  # Full analysis result in JSONB
-    analyzed_at = Column(DateTime(timezone=True), server_default=func.now())
+    model_id = Column(SmallInteger, ForeignKey("analysis_models.id"), index=True)
+    scores = Column(ARRAY(REAL))  # Scores per label, in the order of AnalysisModel.labels
+    analysis_result = Column(JSON, nullable=True)  # Extra data only (errors, flags...)
+    analyzed_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
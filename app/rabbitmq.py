@@ -1,9 +1,20 @@
-from app.utils.queues import COMMENT_ANALYSIS_QUEUE, USER_BLOCK_QUEUE
+from app.utils.queues import (
+    WORK_QUEUES,
+    QUEUE_ARGUMENTS,
+    ENQUEUED_AT_HEADER,
+    DEAD_LETTER_EXCHANGE,
+    DEAD_LETTER_QUEUE,
+    RETRY_COUNT_HEADER,
+    ORIGINAL_QUEUE_HEADER,
+    LAST_ERROR_HEADER,
+    retry_queue_name
+)
 import aio_pika
 from aio_pika.abc import AbstractRobustConnection
 from aio_pika.pool import Pool
 from app.utils.config import settings
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -34,31 +45,135 @@ async def get_channel() -> aio_pika.abc.AbstractChannel:
 
 channel_pool = Pool(get_channel, max_size=10)
 
+declared_queues = set()
+
 async def publish_message(queue_name: str, message: str):
     try:
-        if queue_name not in [COMMENT_ANALYSIS_QUEUE, USER_BLOCK_QUEUE]:
+        if queue_name not in WORK_QUEUES:
             raise ValueError(f"Invalid queue name: {queue_name}")
             
         async with channel_pool.acquire() as channel:
-            await channel.declare_queue(
-                queue_name,
-                durable=True,
-                arguments={
-                    'x-message-ttl': 86400000,
-                    'x-max-length': 10000,
-                    'x-dead-letter-exchange': 'dlx'  # Exchange para mensajes fallidos
-                }
-            )
-            await channel.declare_exchange('dlx', type='direct')
+            # Las colas son durables: basta con declararlas una vez por proceso
+            if queue_name not in declared_queues:
+                await declare_work_queue(channel, queue_name)
+                declared_queues.add(queue_name)
             
             await channel.default_exchange.publish(
                 aio_pika.Message(
                     body=message.encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers={ENQUEUED_AT_HEADER: time.time()}
                 ),
                 routing_key=queue_name,
             )
             logger.info(f"Message published to {queue_name}")
     except Exception as e:
         logger.error(f"Failed to publish message to {queue_name}: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+class PoisonMessage(Exception):
+    """Mensaje que nunca podrá procesarse (formato inválido): va directo a la DLQ."""
+
+async def declare_dead_letter_queue(channel: aio_pika.abc.AbstractChannel):
+    exchange = await channel.declare_exchange(DEAD_LETTER_EXCHANGE, type='direct')
+    queue = await channel.declare_queue(DEAD_LETTER_QUEUE, durable=True)
+    # Los mensajes muertos conservan como routing key el nombre de su cola
+    for queue_name in WORK_QUEUES:
+        await queue.bind(exchange, routing_key=queue_name)
+    return queue
+
+async def declare_work_queue(channel: aio_pika.abc.AbstractChannel, queue_name: str):
+    """Declara la cola de trabajo, sus colas de reintento con backoff y la DLQ."""
+    await declare_dead_letter_queue(channel)
+
+    # Cada nivel espera su TTL y devuelve el mensaje a la cola original
+    for level, delay in enumerate(settings.RETRY_DELAYS_SECONDS):
+        await channel.declare_queue(
+            retry_queue_name(queue_name, level),
+            durable=True,
+            arguments={
+                'x-message-ttl': delay * 1000,
+                'x-dead-letter-exchange': '',
+                'x-dead-letter-routing-key': queue_name
+            }
+        )
+
+    return await channel.declare_queue(queue_name, durable=True, arguments=QUEUE_ARGUMENTS)
+
+async def retry_or_dead_letter(
+    channel: aio_pika.abc.AbstractChannel,
+    queue_name: str,
+    message: aio_pika.abc.AbstractIncomingMessage,
+    error: Exception
+):
+    """
+    Reprograma un mensaje fallido en la cola de reintento que le toca
+    (backoff exponencial) o, si es inválido o agotó los reintentos, lo
+    manda a la DLQ. El mensaje original se confirma después de publicar.
+    """
+    headers = dict(message.headers or {})
+    retries = int(headers.get(RETRY_COUNT_HEADER, 0))
+    headers[LAST_ERROR_HEADER] = f"{type(error).__name__}: {error}"[:1000]
+    headers[ORIGINAL_QUEUE_HEADER] = queue_name
+
+    if isinstance(error, PoisonMessage) or retries >= settings.MAX_RETRIES:
+        exchange = await channel.declare_exchange(DEAD_LETTER_EXCHANGE, type='direct')
+        await exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                headers=headers
+            ),
+            routing_key=queue_name
+        )
+        logger.error(f"Message from {queue_name} sent to {DEAD_LETTER_QUEUE} after {retries} retries: {error}")
+    else:
+        level = min(retries, len(settings.RETRY_DELAYS_SECONDS) - 1)
+        headers[RETRY_COUNT_HEADER] = retries + 1
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                headers=headers
+            ),
+            routing_key=retry_queue_name(queue_name, level)
+        )
+        logger.warning(
+            f"Message from {queue_name} failed ({error}), retry {retries + 1} "
+            f"in {settings.RETRY_DELAYS_SECONDS[level]}s"
+        )
+
+    await message.ack()
+
+async def process_with_retry(
+    channel: aio_pika.abc.AbstractChannel,
+    queue_name: str,
+    message: aio_pika.abc.AbstractIncomingMessage,
+    handler
+) -> bool:
+    """
+    Ejecuta `handler(message)` y gestiona el ack o el reintento. Devuelve False
+    sólo ante fallos transitorios (los que indican que una dependencia falla);
+    un mensaje inválido va a la DLQ y cuenta como procesado.
+    """
+    try:
+        await handler(message)
+    except PoisonMessage as e:
+        try:
+            await retry_or_dead_letter(channel, queue_name, message, e)
+        except Exception as publish_error:
+            logger.error(f"Could not dead-letter message from {queue_name}: {publish_error}")
+            await message.nack(requeue=True)
+            return False
+        return True
+    except Exception as e:
+        try:
+            await retry_or_dead_letter(channel, queue_name, message, e)
+        except Exception as publish_error:
+            # Si ni siquiera se puede reprogramar, que RabbitMQ lo vuelva a entregar
+            logger.error(f"Could not schedule retry for {queue_name}: {publish_error}")
+            await message.nack(requeue=True)
+        return False
+
+    await message.ack()
+    return True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 class CommentCreate(BaseModel):
     text: str = Field(..., min_length=1, max_length=1000)
@@ -21,6 +21,9 @@ class CommentAnalysisResponse(BaseModel):
     toxicity_score: int
     classification: str
     analyzed_at: datetime
+    model: Optional[str] = None
+    # Puntuación por etiqueta del modelo
+    scores: Dict[str, float] = {}
     
     class Config:
         orm_mode = True
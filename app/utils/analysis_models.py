@@ -0,0 +1,65 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import AnalysisModel
+
+logger = logging.getLogger(__name__)
+
+# Caché en proceso: nombre del modelo -> (id en analysis_models, etiquetas guardadas)
+_models: Dict[str, Tuple[int, List[str]]] = {}
+
+async def get_model(db: AsyncSession, name: str, labels: List[str]) -> Tuple[int, List[str]]:
+    """
+    Devuelve (id, etiquetas) del modelo en el diccionario de etiquetas,
+    registrándolo con `labels` si no existe.
+    """
+    if name in _models:
+        return _models[name]
+
+    result = await db.execute(select(AnalysisModel).where(AnalysisModel.name == name))
+    model = result.scalar_one_or_none()
+
+    if model is None:
+        try:
+            model = AnalysisModel(name=name, labels=labels)
+            db.add(model)
+            await db.commit()
+        except IntegrityError:
+            # Otro worker lo registró a la vez
+            await db.rollback()
+            result = await db.execute(select(AnalysisModel).where(AnalysisModel.name == name))
+            model = result.scalar_one()
+
+    _models[name] = (model.id, list(model.labels))
+    return _models[name]
+
+async def resolve_scores(
+    db: AsyncSession,
+    name: str,
+    labels: List[str],
+    scores: List[float]
+) -> Tuple[int, List[float]]:
+    """
+    Devuelve el id del modelo y las puntuaciones en el orden de las etiquetas
+    guardadas, que es el que interpretan las consultas (p. ej. /stats/labels).
+    """
+    model_id, stored_labels = await get_model(db, name, labels)
+    if labels == stored_labels:
+        return model_id, scores
+
+    if sorted(labels) != sorted(stored_labels):
+        # Mismo nombre con otras etiquetas: guardarlas desalinearía todo el historial
+        raise ValueError(f"Labels for model {name} changed: {labels} != stored {stored_labels}")
+
+    by_label = dict(zip(labels, scores))
+    return model_id, [by_label[label] for label in stored_labels]
+
+def unpack_scores(labels: List[str], scores: Optional[List[float]]) -> Dict[str, float]:
+    """Convierte el array de puntuaciones en un dict etiqueta -> puntuación."""
+    if not scores:
+        return {}
+    return dict(zip(labels, scores))
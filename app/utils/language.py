@@ -0,0 +1,44 @@
+import re
+from typing import Optional
+
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+# Palabras muy frecuentes por idioma: suficiente para distinguir comentarios
+# cortos sin cargar ningún modelo de identificación de idioma
+STOPWORDS = {
+    "es": {
+        "el", "la", "los", "las", "de", "que", "y", "en", "un", "una", "es", "por",
+        "con", "no", "para", "lo", "como", "pero", "su", "al", "del", "se", "eres",
+        "muy", "esto", "este", "esta", "porque", "tu", "yo", "mi", "todo", "hay", "sí"
+    },
+    "en": {
+        "the", "and", "is", "are", "you", "to", "of", "in", "it", "that", "this",
+        "for", "with", "not", "be", "have", "was", "on", "your", "what", "so",
+        "but", "they", "my", "just", "all", "do", "an", "at", "i"
+    },
+    "pt": {
+        "o", "os", "as", "que", "e", "em", "um", "uma", "não", "para", "com",
+        "é", "do", "da", "dos", "das", "você", "muito", "isso", "mas", "eu", "ao"
+    },
+    "fr": {
+        "le", "la", "les", "de", "des", "et", "est", "un", "une", "que", "pas",
+        "pour", "dans", "ce", "cette", "vous", "tu", "je", "il", "elle", "avec", "mais"
+    },
+}
+
+SPANISH_MARKS = set("ñ¿¡")
+
+def detect_language(text: str) -> Optional[str]:
+    """Devuelve el código ISO 639-1 más probable, o None si no hay pistas suficientes."""
+    words = WORD_RE.findall(text.lower())
+    scores = {
+        language: sum(1 for word in words if word in stopwords)
+        for language, stopwords in STOPWORDS.items()
+    }
+
+    language, score = max(scores.items(), key=lambda item: item[1])
+    if score > 0:
+        return language
+    if SPANISH_MARKS & set(text):
+        return "es"
+    return None
@@ -0,0 +1,29 @@
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyTracker:
+    """
+    Guarda una ventana deslizante de latencias (en segundos) y
+    calcula percentiles simples para reportarlos en logs o endpoints.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        if not self.samples:
+            return {"count": self.count, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50": round(ordered[int(0.50 * (len(ordered) - 1))], 4),
+            "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 4),
+            "max": round(ordered[-1], 4)
+        }
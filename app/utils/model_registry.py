@@ -0,0 +1,130 @@
+import asyncio
+import gc
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.utils.metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Carga los modelos de clasificación configurados por idioma y los mantiene
+    en memoria mientras quepan en `memory_budget_mb`; al superar el presupuesto
+    se descargan los menos usados recientemente (LRU).
+
+    La carga (descarga de pesos incluida) se hace en un executor para no
+    bloquear el event loop ni los heartbeats de AMQP; `warm_up` la adelanta
+    al arranque del worker.
+    """
+
+    def __init__(
+        self,
+        models_by_language: Dict[str, str],
+        memory_budget_mb: int,
+        device: str,
+        toxic_labels: Optional[Dict[str, str]] = None
+    ):
+        if "default" not in models_by_language:
+            raise ValueError("ANALYSIS_MODELS must define a 'default' model")
+
+        self.models_by_language = models_by_language
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.device = device
+        self.toxic_labels = toxic_labels or {}
+
+        self.loaded: "OrderedDict[str, object]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def model_for(self, language: Optional[str]) -> str:
+        return self.models_by_language.get(language or "default", self.models_by_language["default"])
+
+    def toxic_label(self, name: str) -> str:
+        """Etiqueta cuya puntuación se usa como toxicidad (configurable por modelo)."""
+        return self.toxic_labels.get(name, "toxic")
+
+    def _load(self, name: str):
+        from transformers import pipeline
+
+        started = time.monotonic()
+        classifier = pipeline(
+            "text-classification",
+            model=name,
+            return_all_scores=True,
+            device=self.device
+        )
+
+        # Sin la etiqueta de toxicidad todo saldría "non-toxic" sin avisar
+        labels = list(classifier.model.config.id2label.values())
+        if self.toxic_label(name) not in labels:
+            raise ValueError(
+                f"Model {name} has no '{self.toxic_label(name)}' label (labels: {labels}); "
+                f"set ANALYSIS_TOXIC_LABELS for it"
+            )
+
+        self.sizes[name] = sum(p.numel() * p.element_size() for p in classifier.model.parameters())
+        logger.info(
+            f"Loaded model {name} ({self.sizes[name] / 1024 / 1024:.0f} MB) "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        return classifier
+
+    def _evict(self, keep: str):
+        used = sum(self.sizes[name] for name in self.loaded)
+        for name in list(self.loaded):
+            if used <= self.memory_budget:
+                break
+            if name == keep:
+                continue
+            del self.loaded[name]
+            used -= self.sizes[name]
+            logger.info(f"Evicted model {name} to stay within the memory budget")
+
+        gc.collect()
+        if self.device == "cuda":
+            import torch
+            torch.cuda.empty_cache()
+
+    async def get(self, name: str):
+        classifier = self.loaded.get(name)
+        if classifier is not None:
+            self.loaded.move_to_end(name)
+            return classifier
+
+        # Un único load por modelo aunque lleguen varios mensajes a la vez
+        async with self.locks.setdefault(name, asyncio.Lock()):
+            if name not in self.loaded:
+                loop = asyncio.get_running_loop()
+                self.loaded[name] = await loop.run_in_executor(None, self._load, name)
+                self._evict(keep=name)
+            return self.loaded[name]
+
+    async def warm_up(self):
+        """Carga al arrancar los modelos configurados que quepan en el presupuesto."""
+        for name in dict.fromkeys(self.models_by_language.values()):
+            await self.get(name)
+
+    async def classify(self, name: str, texts: List[str], batch_size: int = 32) -> list:
+        classifier = await self.get(name)
+
+        started = time.monotonic()
+        results = classifier(texts, batch_size=batch_size, truncation=True)
+        per_text = (time.monotonic() - started) / max(len(texts), 1)
+
+        tracker = self.latency.setdefault(name, LatencyTracker())
+        for _ in texts:
+            tracker.observe(per_text)
+        return results
+
+    def log_metrics(self):
+        for name, tracker in self.latency.items():
+            stats = tracker.snapshot()
+            state = "loaded" if name in self.loaded else "evicted"
+            logger.info(
+                f"Modelo {name} ({state}): {stats['count']} textos, latencia p50={stats['p50']}s "
+                f"p95={stats['p95']}s max={stats['max']}s"
+            )
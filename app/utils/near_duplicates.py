@@ -0,0 +1,165 @@
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Primo de Mersenne para las permutaciones de MinHash
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 64) - 1
+SHINGLE_SIZE = 4
+
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+def normalize(text: str) -> str:
+    return NON_WORD_RE.sub(" ", text.lower()).strip()
+
+def indexable(text: str) -> bool:
+    """
+    Textos que quedan vacíos o muy cortos al normalizar (sólo emojis o signos)
+    comparten todos la misma firma; no se indexan y pasan siempre por el modelo.
+    """
+    return len(normalize(text)) >= SHINGLE_SIZE
+
+def shingles(text: str) -> set:
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+class IndexEntry:
+    def __init__(self, comment_id: int, signature: Tuple[int, ...], verdict: dict, inserted_at: float):
+        self.comment_id = comment_id
+        self.signature = signature
+        self.verdict = verdict
+        self.inserted_at = inserted_at
+        self.band_keys: List[Tuple[int, Tuple[int, ...]]] = []
+        # Copias detectadas de este comentario (cluster de raid)
+        self.duplicates = 0
+        self.last_duplicate_at = inserted_at
+
+class NearDuplicateIndex:
+    """
+    Índice MinHash + LSH sobre los comentarios analizados recientemente.
+
+    Guarda la firma y el veredicto de cada comentario durante `ttl_seconds`
+    (como mucho `max_entries` entradas, expulsando las más antiguas). Un texto
+    nuevo cuya similitud de Jaccard estimada con uno indexado sea mayor o igual
+    que `threshold` se considera una copia y hereda su veredicto.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        max_entries: int = 50000,
+        ttl_seconds: float = 3600,
+        num_perm: int = 64,
+        bands: int = 16
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = random.Random(1234)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+        self.entries: "OrderedDict[int, IndexEntry]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [hash(shingle) & MAX_HASH for shingle in shingles(text)]
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes)
+            for a, b in self.permutations
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, comment_id: int):
+        entry = self.entries.pop(comment_id)
+        for key in entry.band_keys:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(comment_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def evict(self, now: Optional[float] = None):
+        now = now or time.time()
+        while self.entries:
+            comment_id, entry = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_entries and now - entry.inserted_at < self.ttl_seconds:
+                break
+            self._remove(comment_id)
+
+    def find(
+        self,
+        signature: Tuple[int, ...],
+        exclude_comment_id: Optional[int] = None
+    ) -> Optional[Tuple[IndexEntry, float]]:
+        """
+        Devuelve (entrada, similitud) del comentario indexado más parecido, o None.
+        `exclude_comment_id` evita que un comentario reprocesado se encuentre a sí mismo.
+        """
+        self.evict()
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(exclude_comment_id)
+
+        best = None
+        for comment_id in candidates:
+            entry = self.entries[comment_id]
+            matches = sum(1 for x, y in zip(signature, entry.signature) if x == y)
+            similarity = matches / len(signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (entry, similarity)
+
+        return best
+
+    def record_duplicate(self, entry: IndexEntry):
+        """Cuenta una copia confirmada (ya guardada) en el cluster de `entry`."""
+        entry.duplicates += 1
+        entry.last_duplicate_at = time.time()
+
+    def add(self, comment_id: int, signature: Tuple[int, ...], verdict: dict):
+        if comment_id in self.entries:
+            self._remove(comment_id)
+
+        entry = IndexEntry(comment_id, signature, verdict, time.time())
+        entry.band_keys = self._band_keys(signature)
+        for key in entry.band_keys:
+            self.buckets.setdefault(key, set()).add(comment_id)
+
+        self.entries[comment_id] = entry
+        self.evict()
+
+    def clusters(self, min_size: int = 3) -> List[dict]:
+        """Clusters de copias (posibles raids) aún presentes en la ventana."""
+        return sorted(
+            (
+                {
+                    "comment_id": entry.comment_id,
+                    "duplicates": entry.duplicates,
+                    "classification": entry.verdict["classification"],
+                    "last_duplicate_at": entry.last_duplicate_at
+                }
+                for entry in self.entries.values()
+                if entry.duplicates + 1 >= min_size
+            ),
+            key=lambda cluster: cluster["duplicates"],
+            reverse=True
+        )
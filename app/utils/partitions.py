@@ -0,0 +1,129 @@
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# Tablas particionadas por rango mensual y su columna de partición
+PARTITIONED_TABLES = {
+    "comments": "created_at",
+    "comment_analysis": "analyzed_at",
+}
+
+# Retraso máximo esperado entre crear un comentario y analizarlo (las colas
+# caducan los mensajes a las 24h). Permite convertir una ventana sobre
+# comment_analysis.analyzed_at en otra sobre comments.created_at y podar ambas tablas.
+MAX_ANALYSIS_DELAY = timedelta(days=1)
+
+PARTITION_NAME_RE = re.compile(r"_y(\d{4})m(\d{2})$")
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + (month.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def partition_month(name: str) -> Optional[datetime]:
+    match = PARTITION_NAME_RE.search(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int, since: Optional[datetime] = None):
+    """
+    Crea (si no existen) la partición DEFAULT y las particiones mensuales desde
+    `since` (por defecto el mes actual) hasta `months_ahead` meses en el futuro.
+
+    Cada partición se crea en su propio savepoint: si la DEFAULT ya tiene filas
+    de ese mes (nadie creó la partición a tiempo) Postgres rechaza crearla; se
+    registra el error y se siguen creando las demás. scripts/retention.py mueve
+    esas filas a su partición con move_default_rows.
+    """
+    now = datetime.now(timezone.utc)
+    first = month_start(since or now)
+    end = add_months(month_start(now), months_ahead + 1)
+
+    for table in PARTITIONED_TABLES:
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+        ))
+
+        month = first
+        while month < end:
+            upper = add_months(month, 1)
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+                        f"PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+                    ))
+            except DBAPIError as e:
+                logger.error(
+                    f"Could not create partition {partition_name(table, month)} ({e.orig}); "
+                    f"run scripts/retention.py to move its rows out of {table}_default"
+                )
+            month = upper
+
+async def default_months(conn: AsyncConnection, table: str) -> List[datetime]:
+    """Meses (UTC) que tienen filas en la partición DEFAULT de `table`."""
+    column = PARTITIONED_TABLES[table]
+    result = await conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', {column} AT TIME ZONE 'UTC') "
+        f"FROM {table}_default ORDER BY 1"
+    ))
+    return [month.replace(tzinfo=timezone.utc) for (month,) in result]
+
+async def move_default_rows(conn: AsyncConnection, table: str, month: datetime) -> int:
+    """
+    Crea la partición de `month` con las filas de ese mes que cayeron en la
+    DEFAULT y la adjunta. Debe ejecutarse en su propia transacción.
+    """
+    column = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    upper = add_months(month, 1)
+
+    # Sin escrituras nuevas en la DEFAULT hasta adjuntar (si no, ATTACH fallaría)
+    await conn.execute(text(f"LOCK TABLE {table}_default IN EXCLUSIVE MODE"))
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {table}_default "
+            f"WHERE {column} >= :lower AND {column} < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"lower": month, "upper": upper}
+    )
+    await conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    return moved.rowcount
+
+async def list_partitions(conn: AsyncConnection, table: str) -> List[Tuple[str, datetime]]:
+    """Devuelve las particiones mensuales de `table` como (nombre, mes), de la más antigua a la más nueva."""
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": table}
+    )
+
+    partitions = []
+    for (name,) in result:
+        month = partition_month(name)
+        if month is not None:
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda item: item[1])
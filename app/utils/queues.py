@@ -1,3 +1,38 @@
 # Standardized queue names
-COMMENT_ANALYSIS_QUEUE = "comment_analysis_queue"
-USER_BLOCK_QUEUE = "user_block_queue"
\ No newline at end of file
+COMMENT_ANALYSIS_QUEUE = "comment_analysis_queue"  # Carril "live": comentarios de usuarios
+# Carril "bulk": importaciones y re-análisis (scripts/reanalyze.py --enqueue).
+# Mensajes {"comment_id": ...}; sólo se reescribe el análisis, sin ofensas ni bloqueos
+COMMENT_BULK_ANALYSIS_QUEUE = "comment_bulk_analysis_queue"
+USER_BLOCK_QUEUE = "user_block_queue"
+
+# Carriles de prioridad para el análisis
+LIVE_LANE = "live"
+BULK_LANE = "bulk"
+ANALYSIS_LANES = {
+    LIVE_LANE: COMMENT_ANALYSIS_QUEUE,
+    BULK_LANE: COMMENT_BULK_ANALYSIS_QUEUE,
+}
+
+# Mensajes fallidos: los rechazos, expirados y desbordados de las colas de
+# trabajo van al exchange 'dlx', cuya cola DLQ se puede reenviar con scripts/replay_dlq.py
+DEAD_LETTER_EXCHANGE = "dlx"
+DEAD_LETTER_QUEUE = "dead_letter_queue"
+WORK_QUEUES = [COMMENT_ANALYSIS_QUEUE, COMMENT_BULK_ANALYSIS_QUEUE, USER_BLOCK_QUEUE]
+
+# Argumentos comunes de declaración (deben coincidir entre API y workers)
+QUEUE_ARGUMENTS = {
+    'x-message-ttl': 86400000,
+    'x-max-length': 10000,
+    'x-dead-letter-exchange': DEAD_LETTER_EXCHANGE
+}
+
+# Header con el instante de publicación (epoch en segundos) para medir latencia
+ENQUEUED_AT_HEADER = "x-enqueued-at"
+
+# Headers de reintentos
+RETRY_COUNT_HEADER = "x-retry-count"
+ORIGINAL_QUEUE_HEADER = "x-original-queue"
+LAST_ERROR_HEADER = "x-last-error"
+
+def retry_queue_name(queue_name: str, level: int) -> str:
+    return f"{queue_name}.retry.{level}"
@@ -0,0 +1,114 @@
+import logging
+import math
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Peticiones rechazadas por ámbito ("user", "global"), exportadas en /api/metrics
+rejected_requests = Counter()
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # Tokens por segundo
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume un token. Devuelve 0 si se permite o los segundos a esperar si no."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+# Token bucket atómico en Redis: KEYS[1] = clave, ARGV = rate, capacity, now
+REDIS_TOKEN_BUCKET = """
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry)
+"""
+
+class RateLimiter:
+    """
+    Limitador por usuario y global. Siempre se comprueba primero un bucket en
+    memoria (sin red); si se configura RATE_LIMIT_REDIS_URL, además se comprueba
+    un bucket compartido en Redis para que el límite valga entre réplicas.
+    """
+
+    MAX_LOCAL_USERS = 100000
+
+    def __init__(self):
+        self.user_rate = settings.RATE_LIMIT_USER_PER_MINUTE / 60
+        self.user_burst = settings.RATE_LIMIT_USER_BURST
+        self.global_rate = settings.RATE_LIMIT_GLOBAL_PER_SECOND
+        self.global_burst = settings.RATE_LIMIT_GLOBAL_BURST
+
+        self.user_buckets = OrderedDict()
+        self.global_bucket = TokenBucket(self.global_rate, self.global_burst)
+
+        self.redis = None
+        self.redis_script = None
+        if settings.RATE_LIMIT_REDIS_URL:
+            import redis.asyncio as aioredis  # Dependencia opcional
+            self.redis = aioredis.from_url(settings.RATE_LIMIT_REDIS_URL)
+            self.redis_script = self.redis.register_script(REDIS_TOKEN_BUCKET)
+
+    def _user_bucket(self, user_id: int) -> TokenBucket:
+        bucket = self.user_buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self.user_buckets[user_id] = bucket
+            if len(self.user_buckets) > self.MAX_LOCAL_USERS:
+                self.user_buckets.popitem(last=False)
+        else:
+            self.user_buckets.move_to_end(user_id)
+        return bucket
+
+    async def _shared_take(self, key: str, rate: float, capacity: float) -> float:
+        try:
+            retry = await self.redis_script(keys=[key], args=[rate, capacity, time.time()])
+            return float(retry)
+        except Exception as e:
+            # Si Redis falla se sigue con el límite local (fail open)
+            logger.warning(f"Shared rate limit backend unavailable: {e}")
+            return 0.0
+
+    async def check(self, user_id: int) -> Optional[int]:
+        """Devuelve None si la petición se permite, o los segundos de Retry-After."""
+        checks = [
+            ("user", self._user_bucket(user_id), f"ratelimit:user:{user_id}", self.user_rate, self.user_burst),
+            ("global", self.global_bucket, "ratelimit:global", self.global_rate, self.global_burst),
+        ]
+
+        for scope, bucket, key, rate, capacity in checks:
+            retry = bucket.take()
+            if retry == 0 and self.redis is not None:
+                retry = await self._shared_take(key, rate, capacity)
+
+            if retry > 0:
+                rejected_requests[scope] += 1
+                return max(1, math.ceil(retry))
+        return None
+
+rate_limiter = RateLimiter()
@@ -1,184 +1,436 @@
 import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
-from dateutil.parser import isoparse
+import time
+from datetime import datetime, timedelta, timezone
 from aio_pika import connect
 from aio_pika.abc import AbstractIncomingMessage
 from sqlalchemy import select
 import torch
-from transformers import pipeline
 
 from app.database import AsyncSessionLocal
 from app.models import CommentAnalysis, User, Comment
 from app.utils.config import settings
-from app.utils.queues import COMMENT_ANALYSIS_QUEUE, USER_BLOCK_QUEUE
-from app.rabbitmq import publish_message
+from app.utils.queues import (
+    USER_BLOCK_QUEUE,
+    LIVE_LANE,
+    BULK_LANE,
+    ANALYSIS_LANES,
+    ENQUEUED_AT_HEADER
+)
+from app.utils.metrics import LatencyTracker
+from app.utils.analysis_models import resolve_scores
+from app.utils.near_duplicates import NearDuplicateIndex, indexable
+from app.utils.language import detect_language
+from app.utils.model_registry import ModelRegistry
+from app.utils.partitions import MAX_ANALYSIS_DELAY
+from app.rabbitmq import publish_message, declare_work_queue, process_with_retry, PoisonMessage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Cargar el modelo una vez
-toxicity_analyzer = pipeline(
-    "text-classification",
-    model="unitary/toxic-bert",
-    return_all_scores=True,
-    device="cuda" if torch.cuda.is_available() else "cpu"
+# Modelos por idioma, cargados bajo demanda dentro del presupuesto de memoria
+model_registry = ModelRegistry(
+    settings.ANALYSIS_MODELS,
+    settings.ANALYSIS_MODEL_MEMORY_MB,
+    device="cuda" if torch.cuda.is_available() else "cpu",
+    toxic_labels=settings.ANALYSIS_TOXIC_LABELS
 )
 
-async def analyze_toxicity(text: str) -> dict:
-    try:
-        results = toxicity_analyzer(text)
-        toxic_score = next((s['score'] for s in results[0] if s['label'] == 'toxic'), 0.0)
-        toxicity_score = int(toxic_score * 100)
-
-        if toxicity_score > 70:
-            classification = "toxic"
-        elif toxicity_score > 30:
-            classification = "potentially-toxic"
-        else:
-            classification = "non-toxic"
-
-        return {
-            "toxicity_score": toxicity_score,
-            "classification": classification,
-            "analysis_result": {
-                "model": "unitary/toxic-bert",
-                "scores": {item['label']: item['score'] for item in results[0]},
-                # timestamp se sobreescribirá luego
-            }
-        }
-    except Exception as e:
-        logger.error(f"Error in toxicity analysis: {e}")
-        return {
-            "toxicity_score": 0,
-            "classification": "error",
-            "analysis_result": {
-                "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
-            }
+def route_model(text: str) -> str:
+    return model_registry.model_for(detect_language(text))
+
+def build_analysis(model_name: str, scores: list) -> dict:
+    # El registro garantiza al cargar que el modelo tiene esta etiqueta
+    toxic_label = model_registry.toxic_label(model_name)
+    toxic_score = next(s['score'] for s in scores if s['label'] == toxic_label)
+    toxicity_score = int(toxic_score * 100)
+
+    if toxicity_score > 70:
+        classification = "toxic"
+    elif toxicity_score > 30:
+        classification = "potentially-toxic"
+    else:
+        classification = "non-toxic"
+
+    return {
+        "toxicity_score": toxicity_score,
+        "classification": classification,
+        "model": model_name,
+        # Mismo orden que devuelve el pipeline (id2label del modelo)
+        "labels": [item['label'] for item in scores],
+        "scores": [item['score'] for item in scores],
+        "analysis_result": None
+    }
+
+def build_error(e: Exception) -> dict:
+    return {
+        "toxicity_score": 0,
+        "classification": "error",
+        "model": None,
+        "labels": [],
+        "scores": None,
+        "analysis_result": {
+            "error": str(e)
         }
+    }
 
-async def process_comment_analysis(message: AbstractIncomingMessage):
-    async with message.process():
+async def analyze_toxicity(text: str) -> dict:
+    # En el worker los fallos se propagan: process_with_retry reintenta o manda a la DLQ
+    return (await analyze_toxicity_batch([text], batch_size=1, raise_errors=True))[0]
+
+async def analyze_toxicity_batch(texts: list, batch_size: int = 32, raise_errors: bool = False) -> list:
+    """
+    Analiza varios textos agrupándolos por modelo: una pasada por cada modelo implicado.
+    Con raise_errors=False (re-análisis) un fallo se devuelve como resultado "error".
+    """
+    by_model = {}
+    for position, text in enumerate(texts):
+        by_model.setdefault(route_model(text), []).append(position)
+
+    analyses = [None] * len(texts)
+    for model_name, positions in by_model.items():
         try:
-            data = json.loads(message.body.decode())
-            comment_id = data["comment_id"]
-            user_id = data["user_id"]
-            text = data["text"]
+            results = await model_registry.classify(
+                model_name,
+                [texts[position] for position in positions],
+                batch_size=batch_size
+            )
+            for position, scores in zip(positions, results):
+                analyses[position] = build_analysis(model_name, scores)
+        except Exception as e:
+            logger.error(f"Error in toxicity analysis with {model_name}: {e}")
+            if raise_errors:
+                raise
+            for position in positions:
+                analyses[position] = build_error(e)
+    return analyses
+
+duplicate_index = NearDuplicateIndex(
+    threshold=settings.DUPLICATE_THRESHOLD,
+    max_entries=settings.DUPLICATE_MAX_ENTRIES,
+    ttl_seconds=settings.DUPLICATE_TTL_SECONDS
+)
+
+async def process_comment_analysis(message: AbstractIncomingMessage):
+    """
+    Analiza un comentario. Los errores se propagan para que process_with_retry
+    lo reprograme con backoff; los mensajes inválidos van directos a la DLQ.
+    """
+    try:
+        data = json.loads(message.body.decode())
+        comment_id = data["comment_id"]
+        user_id = data["user_id"]
+        text = data["text"]
+    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError) as e:
+        raise PoisonMessage(f"Invalid message format: {e}")
 
-            logger.info(f"Processing comment {comment_id} from user {user_id}")
+    logger.info(f"Processing comment {comment_id} from user {user_id}")
 
-            # Obtener una sola hora base para todo el análisis
-            analysis_time = datetime.utcnow()
+    # Obtener una sola hora base para todo el análisis
+    analysis_time = datetime.utcnow()
+
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if user is None:
+            raise PoisonMessage(f"User {user_id} not found")
+
+        # Reintentos, reenvíos desde la DLQ o redeliveries de RabbitMQ pueden traer
+        # un comentario ya guardado; se comprueba antes de pagar la inferencia
+        existing = await db.execute(
+            select(CommentAnalysis.id).where(CommentAnalysis.comment_id == comment_id).limit(1)
+        )
+        if existing.scalar_one_or_none() is not None:
+            logger.info(f"Comment {comment_id} was already analyzed, skipping")
+            return
+
+        # Cerrar la transacción de lectura para no retener la conexión durante la inferencia
+        await db.commit()
+
+        # Copias casi idénticas de un comentario reciente heredan su veredicto sin inferencia
+        signature = duplicate = None
+        if indexable(text):
+            signature = duplicate_index.signature(text)
+            duplicate = duplicate_index.find(signature, exclude_comment_id=comment_id)
+        if duplicate is not None:
+            source, similarity = duplicate
+            analysis_result = dict(source.verdict)
+            analysis_result["analysis_result"] = {
+                "duplicate_of": source.comment_id,
+                "similarity": round(similarity, 3)
+            }
+            logger.info(f"Comment {comment_id} is a near-duplicate of {source.comment_id} ({similarity:.2f})")
+        else:
             analysis_result = await analyze_toxicity(text)
-            analysis_result["analysis_result"]["timestamp"] = analysis_time.isoformat()
-
-            async with AsyncSessionLocal() as db:
-                user = await db.get(User, user_id)
-
-                # ⚠️ Verificar ofensas recientes en los últimos 5 minutos
-                five_minutes_ago = analysis_time - timedelta(minutes=5)
-                recent_result = await db.execute(
-                    select(CommentAnalysis)
-                    .join(Comment, Comment.id == CommentAnalysis.comment_id)
-                    .where(
-                        Comment.user_id == user.id,
-                        Comment.created_at >= five_minutes_ago,
-                        CommentAnalysis.classification.in_(
-                            ["toxic", "potentially-toxic"]
-                        )
-                    )
-                )
-                recent_offenses = recent_result.scalars().all()
-
-                if (
-                    len(recent_offenses) >= 2 and
-                    analysis_result["classification"] in ["toxic", "potentially-toxic"]
-                ):
-                    logger.warning(f"Usuario {user.id} ya tiene 2 comentarios groseros en 5 minutos. Comentario {comment_id} rechazado.")
-                    return
-
-                # Guardar análisis
-                analysis = CommentAnalysis(
-                    comment_id=comment_id,
-                    toxicity_score=analysis_result["toxicity_score"],
-                    classification=analysis_result["classification"],
-                    analysis_result=analysis_result["analysis_result"]
+
+        # Antes de abrir la transacción: registrar un modelo nuevo hace commit
+        model_id, scores = None, analysis_result["scores"]
+        if analysis_result["model"]:
+            model_id, scores = await resolve_scores(
+                db, analysis_result["model"], analysis_result["labels"], scores
+            )
+
+        # Análisis, ofensas y bloqueo van en una sola transacción: si algo falla,
+        # el reintento no encuentra el análisis y lo repite todo. El usuario se
+        # bloquea (FOR UPDATE) para que dos comentarios suyos no cuenten a la vez
+        user = (await db.execute(
+            select(User)
+            .where(User.id == user_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )).scalar_one()
+
+        # ⚠️ Verificar ofensas recientes en los últimos 5 minutos
+        five_minutes_ago = analysis_time - timedelta(minutes=5)
+        recent_result = await db.execute(
+            select(CommentAnalysis)
+            .join(Comment, Comment.id == CommentAnalysis.comment_id)
+            .where(
+                Comment.user_id == user.id,
+                Comment.created_at >= five_minutes_ago,
+                # Implícito (se analiza después de crear), pero permite podar particiones
+                CommentAnalysis.analyzed_at >= five_minutes_ago,
+                CommentAnalysis.classification.in_(
+                    ["toxic", "potentially-toxic"]
                 )
-                db.add(analysis)
-                await db.commit() 
-
-                # ⚠️ Aumentar conteo de ofensas
-                if user and analysis_result["classification"] in ["toxic", "potentially-toxic"]:
-                    last_offense_result = await db.execute(
-                        select(CommentAnalysis)
-                        .join(Comment, Comment.id == CommentAnalysis.comment_id)
-                        .where(
-                            Comment.user_id == user.id,
-                            CommentAnalysis.classification.in_(
-                                ["toxic", "potentially-toxic"]
-                            )
-                        )
-                        .order_by(Comment.created_at.desc())
-                        .limit(1)
+            )
+        )
+        recent_offenses = recent_result.scalars().all()
+
+        if (
+            len(recent_offenses) >= 2 and
+            analysis_result["classification"] in ["toxic", "potentially-toxic"]
+        ):
+            logger.warning(f"Usuario {user.id} ya tiene 2 comentarios groseros en 5 minutos. Comentario {comment_id} rechazado.")
+            return
+
+        # Guardar análisis
+        analysis = CommentAnalysis(
+            comment_id=comment_id,
+            toxicity_score=analysis_result["toxicity_score"],
+            classification=analysis_result["classification"],
+            model_id=model_id,
+            scores=scores,
+            analysis_result=analysis_result["analysis_result"],
+            analyzed_at=analysis_time.replace(tzinfo=timezone.utc)
+        )
+        db.add(analysis)
+
+        block_message = None
+
+        # ⚠️ Aumentar conteo de ofensas
+        if analysis_result["classification"] in ["toxic", "potentially-toxic"]:
+            # Sólo interesa la última hora: acotar analyzed_at y created_at evita
+            # recorrer todo el historial (y todas las particiones) del usuario
+            one_hour_ago = analysis_time - timedelta(hours=1)
+            last_offense_result = await db.execute(
+                select(CommentAnalysis)
+                .join(Comment, Comment.id == CommentAnalysis.comment_id)
+                .where(
+                    Comment.user_id == user.id,
+                    Comment.created_at >= one_hour_ago - MAX_ANALYSIS_DELAY,
+                    CommentAnalysis.analyzed_at >= one_hour_ago,
+                    CommentAnalysis.classification.in_(
+                        ["toxic", "potentially-toxic"]
                     )
-                    last_offense = last_offense_result.scalar_one_or_none()
-
-                    if last_offense:
-                        last_time = isoparse(last_offense.analysis_result.get("timestamp"))
-                        if (analysis_time - last_time).total_seconds() > 3600:
-                            user.offense_count = 0
-
-                    user.offense_count += 1
-                    db.add(user)
-                    await db.commit()
-
-                    # 🚫 Bloqueo automático por ofensas recientes
-                    if len(recent_offenses) >= 1:  # Ya había una, esta sería la 2da
-                        block_duration = 3600  # 1 hora en segundos
-                        unblock_time = analysis_time + timedelta(seconds=block_duration)
-                        
-                        user.is_blocked = True
-                        user.blocked_until = unblock_time
-                        db.add(user)
-                        await db.commit()
-                        
-                        block_message = {
-                            "user_id": user.id,
-                            "block_duration": block_duration,
-                            "unblock_at": unblock_time.isoformat()
-                        }
-                        
-                        await publish_message(USER_BLOCK_QUEUE, json.dumps(block_message))
-                        logger.info(f"Usuario {user.id} bloqueado por 1 hora")
-                        return
-                    # 🚫 Bloqueo escalonado por acumulación total
-                    if user.offense_count >= 3 and not user.is_blocked:
-                        block_duration = 3600 * (user.offense_count - 1)
-                        unblock_time = analysis_time + timedelta(seconds=block_duration)
-
-                        user.is_blocked = True
-                        user.blocked_until = unblock_time
-                        db.add(user)
-                        await db.commit()
-
-                        block_message = {
-                            "user_id": user.id,
-                            "offense_count": user.offense_count,
-                            "block_duration": block_duration,
-                            "unblock_at": unblock_time.isoformat()
-                        }
-
-                        await publish_message(USER_BLOCK_QUEUE, json.dumps(block_message))
-                        logger.info(f"Usuario {user.id} será bloqueado desde {analysis_time.isoformat()} hasta {unblock_time.isoformat()} (duración: {block_duration // 3600}h)")
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid message format: {e}")
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
+                )
+                .order_by(CommentAnalysis.analyzed_at.desc())
+                .limit(1)
+            )
+            last_offense = last_offense_result.scalar_one_or_none()
+
+            if last_offense is None:
+                user.offense_count = 0
+            else:
+                last_time = last_offense.analyzed_at.astimezone(timezone.utc).replace(tzinfo=None)
+                if (analysis_time - last_time).total_seconds() > 3600:
+                    user.offense_count = 0
+
+            user.offense_count += 1
+
+            # 🚫 Bloqueo automático por ofensas recientes
+            if len(recent_offenses) >= 1:  # Ya había una, esta sería la 2da
+                block_duration = 3600  # 1 hora en segundos
+                unblock_time = analysis_time + timedelta(seconds=block_duration)
+
+                user.is_blocked = True
+                user.blocked_until = unblock_time
+
+                block_message = {
+                    "user_id": user.id,
+                    "block_duration": block_duration,
+                    "unblock_at": unblock_time.isoformat()
+                }
+                block_log = f"Usuario {user.id} bloqueado por 1 hora"
+            # 🚫 Bloqueo escalonado por acumulación total
+            elif user.offense_count >= 3 and not user.is_blocked:
+                block_duration = 3600 * (user.offense_count - 1)
+                unblock_time = analysis_time + timedelta(seconds=block_duration)
+
+                user.is_blocked = True
+                user.blocked_until = unblock_time
+
+                block_message = {
+                    "user_id": user.id,
+                    "offense_count": user.offense_count,
+                    "block_duration": block_duration,
+                    "unblock_at": unblock_time.isoformat()
+                }
+                block_log = f"Usuario {user.id} será bloqueado desde {analysis_time.isoformat()} hasta {unblock_time.isoformat()} (duración: {block_duration // 3600}h)"
+
+            db.add(user)
+
+        await db.commit()
+
+    # Sólo se indexa lo ya guardado: si el guardado falla, el reintento no debe
+    # encontrarse a sí mismo ni contar copias que no existen
+    if duplicate is not None:
+        duplicate_index.record_duplicate(duplicate[0])
+    elif signature is not None:
+        duplicate_index.add(comment_id, signature, analysis_result)
+
+    # El bloqueo ya está guardado en users; el mensaje sólo avisa al block worker
+    if block_message is not None:
+        await publish_message(USER_BLOCK_QUEUE, json.dumps(block_message))
+        logger.info(block_log)
+
+async def process_bulk_analysis(message: AbstractIncomingMessage):
+    """
+    Re-analiza un comentario del carril bulk (re-análisis o importación).
+    Sólo escribe el análisis: sin ofensas, bloqueos ni índice de duplicados,
+    que son moderación en vivo y no aplican a comentarios históricos.
+    Si ya hay análisis se actualiza conservando analyzed_at; si no, se crea.
+    """
+    try:
+        comment_id = json.loads(message.body.decode())["comment_id"]
+    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError) as e:
+        raise PoisonMessage(f"Invalid bulk message format: {e}")
+
+    async with AsyncSessionLocal() as db:
+        comment = (await db.execute(
+            select(Comment.text, Comment.created_at).where(Comment.id == comment_id)
+        )).one_or_none()
+        if comment is None:
+            raise PoisonMessage(f"Comment {comment_id} not found")
+
+        analysis_result = await analyze_toxicity(comment.text)
+        model_id, scores = await resolve_scores(
+            db, analysis_result["model"], analysis_result["labels"], analysis_result["scores"]
+        )
+
+        analysis = (await db.execute(
+            select(CommentAnalysis)
+            .where(
+                CommentAnalysis.comment_id == comment_id,
+                # El análisis nunca es anterior al comentario: poda particiones
+                CommentAnalysis.analyzed_at >= comment.created_at
+            )
+            .order_by(CommentAnalysis.analyzed_at.desc())
+            .limit(1)
+        )).scalar_one_or_none()
+
+        if analysis is None:
+            analysis = CommentAnalysis(comment_id=comment_id)
+            db.add(analysis)
+        else:
+            # Se conservan las marcas previas (duplicate_of, errores...)
+            analysis.analysis_result = dict(analysis.analysis_result or {})
+            analysis.analysis_result["reanalyzed_at"] = datetime.utcnow().isoformat()
+
+        analysis.toxicity_score = analysis_result["toxicity_score"]
+        analysis.classification = analysis_result["classification"]
+        analysis.model_id = model_id
+        analysis.scores = scores
+        await db.commit()
+
+    logger.info(f"Bulk re-analysis of comment {comment_id}: {analysis_result['classification']}")
+
+# Handler de cada carril
+LANE_HANDLERS = {
+    LIVE_LANE: process_comment_analysis,
+    BULK_LANE: process_bulk_analysis,
+}
+
+class LaneScheduler:
+    """
+    Reparte los mensajes de los carriles live y bulk: siempre vacía primero
+    el carril live, pero garantiza al carril bulk una fracción mínima de los
+    mensajes procesados (bulk_min_share) para que nunca se quede sin avanzar.
+    """
+
+    # Tamaño de la ventana sobre la que se calcula la fracción servida
+    WINDOW = 100
+
+    def __init__(self, bulk_min_share: float):
+        self.bulk_min_share = bulk_min_share
+        self.buffers = {lane: asyncio.Queue() for lane in ANALYSIS_LANES}
+        self.served = {lane: 0 for lane in ANALYSIS_LANES}
+        self.latency = {lane: LatencyTracker() for lane in ANALYSIS_LANES}
+        self.has_work = asyncio.Event()
+
+    def consumer(self, lane: str):
+        async def on_message(message: AbstractIncomingMessage):
+            await self.buffers[lane].put(message)
+            self.has_work.set()
+        return on_message
+
+    def _pick_lane(self):
+        live = self.buffers[LIVE_LANE]
+        bulk = self.buffers[BULK_LANE]
+        total = self.served[LIVE_LANE] + self.served[BULK_LANE]
+        bulk_starved = self.served[BULK_LANE] < self.bulk_min_share * (total + 1)
+
+        if not live.empty() and not (bulk_starved and not bulk.empty()):
+            return LIVE_LANE
+        if not bulk.empty():
+            return BULK_LANE
+        return None
+
+    async def next(self, timeout: float = 5.0):
+        """Devuelve (carril, mensaje), o None si no llegó nada en `timeout` segundos."""
+        lane = self._pick_lane()
+        if lane is None:
+            self.has_work.clear()
+            try:
+                await asyncio.wait_for(self.has_work.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            lane = self._pick_lane()
+            if lane is None:
+                return None
+
+        self.served[lane] += 1
+        if sum(self.served.values()) >= self.WINDOW:
+            self.served = {name: 0 for name in self.served}
+        return lane, self.buffers[lane].get_nowait()
+
+    def observe(self, lane: str, message: AbstractIncomingMessage):
+        enqueued_at = (message.headers or {}).get(ENQUEUED_AT_HEADER)
+        if enqueued_at is None:
+            return
+        self.latency[lane].observe(max(0.0, time.time() - float(enqueued_at)))
+
+    def log_metrics(self):
+        for lane, tracker in self.latency.items():
+            stats = tracker.snapshot()
+            logger.info(
+                f"Carril {lane}: {stats['count']} mensajes, latencia p50={stats['p50']}s "
+                f"p95={stats['p95']}s max={stats['max']}s, pendientes={self.buffers[lane].qsize()}"
+            )
+
+        model_registry.log_metrics()
+
+        for cluster in duplicate_index.clusters(settings.DUPLICATE_CLUSTER_MIN_SIZE)[:10]:
+            logger.warning(
+                f"Posible raid: comentario {cluster['comment_id']} con {cluster['duplicates']} copias "
+                f"({cluster['classification']})"
+            )
 
 async def main():
+    # Cargar los modelos antes de consumir: una descarga a mitad de un mensaje
+    # bloquearía el worker y, si un modelo no es válido, mejor fallar aquí
+    await model_registry.warm_up()
+
     while True:
         try:
             connection = await connect(
@@ -188,19 +440,38 @@ async def main():
             async with connection:
                 channel = await connection.channel()
                 await channel.set_qos(prefetch_count=2)
-                queue = await channel.declare_queue(
-                    COMMENT_ANALYSIS_QUEUE,
-                    durable=True,
-                    arguments={
-                        'x-message-ttl': 86400000,
-                        'x-max-length': 10000,
-                        'x-dead-letter-exchange': 'dlx'
-                    }
-                )
+
+                # Un consumidor por carril; el planificador decide el orden
+                scheduler = LaneScheduler(settings.ANALYSIS_BULK_MIN_SHARE)
+                for lane, queue_name in ANALYSIS_LANES.items():
+                    queue = await declare_work_queue(channel, queue_name)
+                    await queue.consume(scheduler.consumer(lane))
+
                 logger.info("Worker ready. Waiting for messages...")
-                async with queue.iterator() as queue_iter:
-                    async for message in queue_iter:
-                        await process_comment_analysis(message)
+                processed = 0
+                consecutive_failures = 0
+                while True:
+                    item = await scheduler.next()
+                    if item is None:
+                        if channel.is_closed:
+                            raise ConnectionError("RabbitMQ channel closed")
+                        continue
+
+                    lane, message = item
+                    ok = await process_with_retry(
+                        channel, ANALYSIS_LANES[lane], message, LANE_HANDLERS[lane]
+                    )
+                    scheduler.observe(lane, message)
+
+                    # Si una dependencia falla de forma continuada, bajar el ritmo
+                    # en vez de quemar todos los reintentos de golpe
+                    consecutive_failures = 0 if ok else consecutive_failures + 1
+                    if consecutive_failures:
+                        await asyncio.sleep(min(2 ** consecutive_failures, 30))
+
+                    processed += 1
+                    if processed % settings.ANALYSIS_METRICS_LOG_EVERY == 0:
+                        scheduler.log_metrics()
         except Exception as e:
             logger.error(f"Connection error: {e}, retrying in 10 seconds...")
             await asyncio.sleep(10)
@@ -6,49 +6,51 @@ from aio_pika import connect
 from aio_pika.abc import AbstractIncomingMessage
 from ..database import AsyncSessionLocal
 from ..models import User
+from ..rabbitmq import declare_work_queue, process_with_retry, PoisonMessage
 from ..utils.config import settings
 
 async def process_user_block(message: AbstractIncomingMessage):
-    async with message.process():
-        try:
-            data = json.loads(message.body.decode())
-            user_id = data["user_id"]
-            block_duration = data["block_duration"]
-            
-            async with AsyncSessionLocal() as db:
-                user = await db.get(User, user_id)
-                if user:
-                    user.is_blocked = True
-                    user.blocked_until = datetime.now() + timedelta(seconds=block_duration)
-                    db.add(user)
-                    await db.commit()
-                    print(f"User {user_id} blocked until {user.blocked_until}")
-                    
-        except Exception as e:
-            print(f"Error processing block message: {e}")
+    try:
+        data = json.loads(message.body.decode())
+        user_id = data["user_id"]
+        block_duration = data["block_duration"]
+    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError) as e:
+        raise PoisonMessage(f"Invalid block message: {e}")
+
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if user:
+            user.is_blocked = True
+            user.blocked_until = datetime.now() + timedelta(seconds=block_duration)
+            db.add(user)
+            await db.commit()
+            print(f"User {user_id} blocked until {user.blocked_until}")
 
 async def main():
-    connection = await connect(
-        f"amqp://{settings.RABBITMQ_USER}:{settings.RABBITMQ_PASSWORD}@{settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}/"
-    )
-    
-    async with connection:
-        channel = await connection.channel()
-        await channel.set_qos(prefetch_count=1)
-        
-        queue = await channel.declare_queue(
-            USER_BLOCK_QUEUE,
-            durable=True,
-            arguments={
-                'x-message-ttl': 86400000,
-                'x-max-length': 10000,
-                'x-dead-letter-exchange': 'dlx'
-            }
-)
-        
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                await process_user_block(message)
+    while True:
+        try:
+            connection = await connect(
+                f"amqp://{settings.RABBITMQ_USER}:{settings.RABBITMQ_PASSWORD}@{settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}/"
+            )
+
+            async with connection:
+                channel = await connection.channel()
+                await channel.set_qos(prefetch_count=1)
+
+                queue = await declare_work_queue(channel, USER_BLOCK_QUEUE)
+
+                consecutive_failures = 0
+                async with queue.iterator() as queue_iter:
+                    async for message in queue_iter:
+                        ok = await process_with_retry(channel, USER_BLOCK_QUEUE, message, process_user_block)
+
+                        # Bajar el ritmo mientras la base de datos siga fallando
+                        consecutive_failures = 0 if ok else consecutive_failures + 1
+                        if consecutive_failures:
+                            await asyncio.sleep(min(2 ** consecutive_failures, 30))
+        except Exception as e:
+            print(f"Connection error: {e}, retrying in 10 seconds...")
+            await asyncio.sleep(10)
 
 if __name__ == "__main__":
     asyncio.run(main())
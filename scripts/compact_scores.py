@@ -0,0 +1,99 @@
+"""
+Migra las puntuaciones guardadas como JSON en `comment_analysis.analysis_result`
+a las columnas compactas `model_id` + `scores` (real[]).
+
+Registra cada modelo en `analysis_models` con el orden de sus etiquetas,
+rellena las columnas nuevas por lotes de ids y elimina del JSON las claves
+"model", "scores" y "timestamp" (la hora ya está en analyzed_at). Con
+--vacuum ejecuta VACUUM FULL al final para recuperar el espacio.
+
+Ejemplo:
+    python scripts/compact_scores.py --vacuum
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from app.database import engine, Base
+
+TABLE_SIZE_SQL = (
+    "SELECT COALESCE(SUM(pg_total_relation_size(inhrelid)), pg_total_relation_size('comment_analysis')) "
+    "FROM pg_inherits WHERE inhparent = 'comment_analysis'::regclass"
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Move JSON scores to compact typed columns")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--vacuum", action="store_true", help="Run VACUUM FULL ANALYZE afterwards")
+    return parser.parse_args()
+
+async def table_size(conn) -> int:
+    return (await conn.execute(text(TABLE_SIZE_SQL))).scalar()
+
+async def migrate(args):
+    async with engine.begin() as conn:
+        size_before = await table_size(conn)
+
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "ALTER TABLE comment_analysis "
+            "ADD COLUMN IF NOT EXISTS model_id SMALLINT REFERENCES analysis_models (id), "
+            "ADD COLUMN IF NOT EXISTS scores REAL[]"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_comment_analysis_model_id ON comment_analysis (model_id)"
+        ))
+
+        # Diccionario de etiquetas: el orden de las claves de un resultado de cada modelo
+        await conn.execute(text(
+            "INSERT INTO analysis_models (name, labels) "
+            "SELECT DISTINCT ON (analysis_result->>'model') analysis_result->>'model', "
+            "ARRAY(SELECT json_object_keys(analysis_result->'scores')) "
+            "FROM comment_analysis "
+            "WHERE model_id IS NULL AND analysis_result->>'model' IS NOT NULL "
+            "ON CONFLICT (name) DO NOTHING"
+        ))
+
+        bounds = (await conn.execute(text("SELECT MIN(id), MAX(id) FROM comment_analysis"))).first()
+
+    if bounds[0] is None:
+        print("comment_analysis is empty, nothing to migrate")
+        return
+
+    migrated = 0
+    # Un lote por transacción para no mantener bloqueos largos
+    for start in range(bounds[0], bounds[1] + 1, args.batch_size):
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text(
+                    "UPDATE comment_analysis ca SET "
+                    "model_id = m.id, "
+                    "scores = ARRAY("
+                    "  SELECT (ca.analysis_result->'scores'->>label)::real "
+                    "  FROM unnest(m.labels) WITH ORDINALITY AS l(label, position) ORDER BY position"
+                    "), "
+                    "analysis_result = NULLIF("
+                    "  (ca.analysis_result::jsonb - 'model' - 'scores' - 'timestamp')::json::text, '{}'"
+                    ")::json "
+                    "FROM analysis_models m "
+                    "WHERE m.name = ca.analysis_result->>'model' AND ca.model_id IS NULL "
+                    "AND ca.id >= :start AND ca.id < :end"
+                ),
+                {"start": start, "end": start + args.batch_size}
+            )
+            migrated += result.rowcount
+        print(f"Migrated {migrated} rows (up to id {start + args.batch_size - 1})")
+
+    if args.vacuum:
+        # VACUUM no puede ejecutarse dentro de una transacción
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM (FULL, ANALYZE) comment_analysis"))
+
+    async with engine.connect() as conn:
+        size_after = await table_size(conn)
+    print(f"comment_analysis size: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    asyncio.run(migrate(parse_args()))
@@ -1,10 +1,13 @@
 import asyncio
 from app.database import engine, Base, AsyncSessionLocal
 from app.models import User
+from app.utils.config import settings
+from app.utils.partitions import ensure_partitions
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn, settings.PARTITION_MONTHS_AHEAD)
     
     # Create some test users
     async with AsyncSessionLocal() as db:
@@ -0,0 +1,90 @@
+"""
+Convierte las tablas `comments` y `comment_analysis` existentes (sin particionar)
+en tablas particionadas por mes.
+
+Las tablas antiguas se renombran a *_legacy junto con sus índices y secuencias,
+se crean las nuevas tablas particionadas, se copian los datos y se eliminan las
+antiguas. Todo ocurre en una única transacción.
+
+Ejemplo:
+    python scripts/partition_tables.py
+"""
+import asyncio
+from sqlalchemy import text
+
+from app.database import engine, Base
+from app.models import Comment, CommentAnalysis
+from app.utils.config import settings
+from app.utils.partitions import PARTITIONED_TABLES, ensure_partitions
+
+async def is_partitioned(conn, table: str) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"),
+        {"table": table}
+    )
+    relkind = result.scalar_one_or_none()
+    return relkind is None or relkind == "p"
+
+async def rename_legacy(conn, table: str):
+    legacy = f"{table}_legacy"
+    await conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+
+    # Los nombres de índices y secuencias chocarían con los de la tabla nueva
+    indexes = await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table"),
+        {"table": legacy}
+    )
+    for (index,) in indexes.all():
+        await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+
+    await conn.execute(text(f"ALTER SEQUENCE IF EXISTS {table}_id_seq RENAME TO {legacy}_id_seq"))
+
+async def migrate():
+    async with engine.begin() as conn:
+        legacy_tables = [
+            table for table in PARTITIONED_TABLES
+            if not await is_partitioned(conn, table)
+        ]
+        if not legacy_tables:
+            print("Tables are already partitioned, nothing to do")
+            return
+
+        for table in legacy_tables:
+            await rename_legacy(conn, table)
+
+        await conn.run_sync(Base.metadata.create_all)
+
+        # Particiones desde el dato más antiguo hasta los próximos meses
+        for table in legacy_tables:
+            column = PARTITIONED_TABLES[table]
+            oldest = (await conn.execute(text(f"SELECT MIN({column}) FROM {table}_legacy"))).scalar()
+            await ensure_partitions(conn, settings.PARTITION_MONTHS_AHEAD, since=oldest)
+
+        if "comments" in legacy_tables:
+            await conn.execute(text(
+                "INSERT INTO comments (id, text, user_id, created_at, updated_at) "
+                "SELECT id, text, user_id, COALESCE(created_at, now()), updated_at FROM comments_legacy"
+            ))
+        if "comment_analysis" in legacy_tables:
+            await conn.execute(text(
+                "INSERT INTO comment_analysis "
+                "(id, comment_id, toxicity_score, classification, analysis_result, analyzed_at) "
+                "SELECT id, comment_id, toxicity_score, classification, analysis_result, "
+                "COALESCE(analyzed_at, now()) FROM comment_analysis_legacy"
+            ))
+
+        for model in (Comment, CommentAnalysis):
+            table = model.__tablename__
+            if table in legacy_tables:
+                await conn.execute(text(
+                    f"SELECT setval('{table}_id_seq', (SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+                ))
+
+        # comment_analysis_legacy primero: tenía una FK hacia comments_legacy
+        for table in sorted(legacy_tables, key=lambda name: name != "comment_analysis"):
+            await conn.execute(text(f"DROP TABLE {table}_legacy"))
+
+        print(f"Partitioned tables: {', '.join(legacy_tables)}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,270 @@
+"""
+Re-analiza comentarios ya analizados con el modelo y umbrales actuales.
+
+Recorre `comments` en orden de id con un cursor del lado del servidor,
+ejecuta la inferencia por lotes y actualiza `comment_analysis` en bloque.
+El progreso se guarda en un fichero de checkpoint para poder reanudar
+tras una caída.
+
+Con --enqueue no se analiza aquí: los comentarios se publican en el carril
+bulk y los procesan los workers de análisis sin retrasar el carril live.
+
+Ejemplo:
+    python scripts/reanalyze.py --since 2024-01-01 --classification toxic --max-rate 50
+    python scripts/reanalyze.py --model unitary/toxic-bert --enqueue
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import aio_pika
+from dateutil.parser import isoparse
+from sqlalchemy import select, update
+
+from app.database import AsyncSessionLocal
+from app.models import AnalysisModel, Comment, CommentAnalysis
+from app.rabbitmq import RABBITMQ_URL, declare_work_queue
+from app.utils.analysis_models import resolve_scores
+from app.utils.queues import COMMENT_BULK_ANALYSIS_QUEUE, ENQUEUED_AT_HEADER
+from app.workers.analysis_worker import analyze_toxicity_batch, route_model
+
+logger = logging.getLogger("reanalyze")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-analyze stored comments with the current model")
+    parser.add_argument("--since", type=isoparse, help="Only comments created at or after this date")
+    parser.add_argument("--until", type=isoparse, help="Only comments created before this date")
+    parser.add_argument(
+        "--classification",
+        action="append",
+        choices=["non-toxic", "potentially-toxic", "toxic", "error"],
+        help="Only analyses with this classification (repeatable)"
+    )
+    parser.add_argument("--model", help="Only analyses produced by this model")
+    parser.add_argument(
+        "--stale-only",
+        action="store_true",
+        help="Skip analyses already produced by the model the comment's language routes to"
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-rate", type=float, default=0, help="Max comments per second (0 = unlimited)")
+    parser.add_argument("--checkpoint", default="reanalyze.checkpoint.json")
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--batch-retries", type=int, default=3, help="Retries for a batch with inference errors")
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Publish the comments to the bulk analysis lane instead of analyzing them here"
+    )
+    parser.add_argument(
+        "--max-queued",
+        type=int,
+        default=5000,
+        help="With --enqueue, wait while the bulk queue holds more messages than this"
+    )
+    return parser.parse_args()
+
+def checkpoint_filters(args) -> dict:
+    return {
+        "since": args.since.isoformat() if args.since else None,
+        "until": args.until.isoformat() if args.until else None,
+        "classification": sorted(args.classification or []),
+        "model": args.model,
+        "stale_only": args.stale_only,
+        "enqueue": args.enqueue
+    }
+
+def load_checkpoint(args) -> int:
+    if args.reset or not os.path.exists(args.checkpoint):
+        return 0
+
+    with open(args.checkpoint) as f:
+        checkpoint = json.load(f)
+
+    if checkpoint["filters"] != checkpoint_filters(args):
+        raise SystemExit(
+            f"Checkpoint {args.checkpoint} was created with different filters; "
+            f"use --reset or another --checkpoint file"
+        )
+    return checkpoint["last_comment_id"]
+
+def save_checkpoint(args, last_comment_id: int, processed: int):
+    tmp_path = f"{args.checkpoint}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "filters": checkpoint_filters(args),
+            "last_comment_id": last_comment_id,
+            "processed": processed,
+            "updated_at": datetime.utcnow().isoformat()
+        }, f)
+    # Reemplazo atómico para no dejar un checkpoint a medias
+    os.replace(tmp_path, args.checkpoint)
+
+def model_id_subquery(name: str):
+    return select(AnalysisModel.id).where(AnalysisModel.name == name).scalar_subquery()
+
+def build_query(args, last_comment_id: int):
+    query = (
+        select(
+            Comment.id,
+            Comment.text,
+            CommentAnalysis.id,
+            CommentAnalysis.analyzed_at,
+            AnalysisModel.name,
+            CommentAnalysis.analysis_result
+        )
+        .join(CommentAnalysis, Comment.id == CommentAnalysis.comment_id)
+        .outerjoin(AnalysisModel, AnalysisModel.id == CommentAnalysis.model_id)
+        .where(Comment.id > last_comment_id)
+        .order_by(Comment.id)
+    )
+
+    if args.since:
+        query = query.where(Comment.created_at >= args.since)
+    if args.until:
+        query = query.where(Comment.created_at < args.until)
+    if args.classification:
+        query = query.where(CommentAnalysis.classification.in_(args.classification))
+    if args.model:
+        query = query.where(CommentAnalysis.model_id == model_id_subquery(args.model))
+
+    return query.execution_options(yield_per=args.batch_size)
+
+async def analyze_batch(args, rows: list) -> list:
+    """
+    Analiza el lote reintentándolo si alguna fila falla (p. ej. sin memoria).
+    Si sigue fallando se aborta sin mover el checkpoint, para no saltarse filas.
+    """
+    texts = [row[1] for row in rows]
+    for attempt in range(args.batch_retries + 1):
+        results = await analyze_toxicity_batch(texts, batch_size=args.batch_size)
+        errors = [result for result in results if result["classification"] == "error"]
+        if not errors:
+            return results
+
+        logger.warning(
+            f"{len(errors)}/{len(rows)} rows failed ({errors[0]['analysis_result']['error']}), "
+            f"attempt {attempt + 1}/{args.batch_retries + 1}"
+        )
+        await asyncio.sleep(2 ** attempt)
+
+    raise SystemExit(
+        f"Batch starting at comment {rows[0][0]} keeps failing; "
+        f"checkpoint left before it, fix the problem and run again to resume"
+    )
+
+async def write_batch(rows: list, results: list) -> int:
+    updates = []
+    async with AsyncSessionLocal() as db:
+        for (comment_id, _, analysis_id, analyzed_at, _, previous), result in zip(rows, results):
+            model_id, scores = await resolve_scores(db, result["model"], result["labels"], result["scores"])
+
+            # analyzed_at no se toca: el worker lo usa para contar ofensas
+            updates.append({
+                "id": analysis_id,
+                "analyzed_at": analyzed_at,
+                "toxicity_score": result["toxicity_score"],
+                "classification": result["classification"],
+                "model_id": model_id,
+                "scores": scores,
+                # Se conservan las marcas previas (duplicate_of para /raids, errores...)
+                "analysis_result": {**(previous or {}), "reanalyzed_at": datetime.utcnow().isoformat()}
+            })
+
+        if updates:
+            # UPDATE por clave primaria (id, analyzed_at) en un único executemany
+            await db.execute(update(CommentAnalysis), updates)
+            await db.commit()
+    return len(updates)
+
+async def enqueue_batch(channel, args, rows: list) -> int:
+    """Publica el lote en el carril bulk, esperando si la cola va muy cargada."""
+    # La cola tiene x-max-length: sin esperar, lo que desborde acabaría en la DLQ
+    while True:
+        queue = await channel.declare_queue(COMMENT_BULK_ANALYSIS_QUEUE, passive=True)
+        if queue.declaration_result.message_count <= args.max_queued:
+            break
+        await asyncio.sleep(5)
+
+    for row in rows:
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=json.dumps({"comment_id": row[0]}).encode(),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                headers={ENQUEUED_AT_HEADER: time.time()}
+            ),
+            routing_key=COMMENT_BULK_ANALYSIS_QUEUE
+        )
+    return len(rows)
+
+async def reanalyze(args):
+    last_comment_id = load_checkpoint(args)
+    if last_comment_id:
+        logger.info(f"Resuming after comment {last_comment_id}")
+
+    connection = channel = None
+    if args.enqueue:
+        connection = await aio_pika.connect(RABBITMQ_URL)
+        channel = await connection.channel()
+        await declare_work_queue(channel, COMMENT_BULK_ANALYSIS_QUEUE)
+
+    try:
+        await run_batches(args, last_comment_id, channel)
+    finally:
+        if connection is not None:
+            await connection.close()
+
+async def run_batches(args, last_comment_id: int, channel):
+    processed = 0
+    started = time.monotonic()
+
+    # Sesión de solo lectura para el cursor; las escrituras usan sesiones propias
+    async with AsyncSessionLocal() as read_db:
+        result = await read_db.stream(build_query(args, last_comment_id))
+
+        async for rows in result.partitions(args.batch_size):
+            batch_started = time.monotonic()
+            last_row_id = rows[-1][0]
+
+            # El modelo que toca depende del idioma, así que se filtra aquí y no en SQL
+            if args.stale_only:
+                rows = [row for row in rows if row[4] != route_model(row[1])]
+
+            if args.enqueue:
+                # Los fallos del worker van a reintentos y a la DLQ; aquí basta con publicar
+                written = await enqueue_batch(channel, args, rows)
+            else:
+                # El checkpoint sólo avanza cuando todo el lote se ha escrito
+                results = await analyze_batch(args, rows) if rows else []
+                written = await write_batch(rows, results)
+
+            processed += len(rows)
+            last_comment_id = last_row_id
+            save_checkpoint(args, last_comment_id, processed)
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Batch up to comment {last_comment_id}: {written}/{len(rows)} "
+                f"{'enqueued' if args.enqueue else 'updated'}, "
+                f"{processed} total ({processed / max(elapsed, 1e-6):.1f} comments/s)"
+            )
+
+            # Limitar el ritmo para no competir con los workers en vivo
+            if args.max_rate > 0:
+                min_duration = len(rows) / args.max_rate
+                remaining = min_duration - (time.monotonic() - batch_started)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+
+    logger.info(
+        f"Done: {processed} comments {'enqueued' if args.enqueue else 're-analyzed'}, "
+        f"last comment {last_comment_id}"
+    )
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(reanalyze(parse_args()))
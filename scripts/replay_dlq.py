@@ -0,0 +1,86 @@
+"""
+Reenvía los mensajes de la dead letter queue a su cola original.
+
+Los mensajes reenviados vuelven con el contador de reintentos a cero. Con
+--dry-run sólo se listan (se devuelven a la DLQ sin tocarlos).
+
+Ejemplo:
+    python scripts/replay_dlq.py --queue comment_analysis_queue --limit 100
+"""
+import argparse
+import asyncio
+
+import aio_pika
+
+from app.rabbitmq import RABBITMQ_URL, declare_dead_letter_queue, declare_work_queue
+from app.utils.queues import (
+    WORK_QUEUES,
+    RETRY_COUNT_HEADER,
+    ORIGINAL_QUEUE_HEADER,
+    LAST_ERROR_HEADER
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay dead-lettered messages")
+    parser.add_argument("--queue", choices=WORK_QUEUES, help="Only replay messages from this queue")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+def original_queue(message: aio_pika.abc.AbstractIncomingMessage) -> str:
+    headers = message.headers or {}
+    if ORIGINAL_QUEUE_HEADER in headers:
+        return headers[ORIGINAL_QUEUE_HEADER]
+    # Mensajes muertos por RabbitMQ (TTL, desbordamiento, rechazo)
+    deaths = headers.get("x-death") or []
+    if deaths:
+        return deaths[0].get("queue")
+    return message.routing_key
+
+async def replay(args):
+    connection = await aio_pika.connect(RABBITMQ_URL)
+    async with connection:
+        channel = await connection.channel()
+        dlq = await declare_dead_letter_queue(channel)
+        for queue_name in WORK_QUEUES:
+            await declare_work_queue(channel, queue_name)
+
+        replayed = skipped = 0
+        # Los saltados se devuelven al final para no volver a leerlos en este bucle
+        held = []
+        while replayed + skipped < args.limit:
+            message = await dlq.get(no_ack=False, fail=False)
+            if message is None:
+                break
+
+            queue_name = original_queue(message)
+            error = (message.headers or {}).get(LAST_ERROR_HEADER, "-")
+
+            if args.dry_run or queue_name not in WORK_QUEUES or (args.queue and queue_name != args.queue):
+                print(f"{'Would replay' if args.dry_run else 'Skipping'} message for {queue_name}: {error}")
+                held.append(message)
+                skipped += 1
+                continue
+
+            headers = {
+                key: value for key, value in (message.headers or {}).items()
+                if key not in (RETRY_COUNT_HEADER, LAST_ERROR_HEADER, "x-death")
+            }
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers=headers
+                ),
+                routing_key=queue_name
+            )
+            await message.ack()
+            replayed += 1
+
+        for message in held:
+            await message.nack(requeue=True)
+
+        print(f"Replayed {replayed} messages, left {skipped} in the dead letter queue")
+
+if __name__ == "__main__":
+    asyncio.run(replay(parse_args()))
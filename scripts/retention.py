@@ -0,0 +1,95 @@
+"""
+Archiva y elimina las particiones mensuales más antiguas que RETENTION_MONTHS.
+
+Cada partición vencida se vuelca con COPY a un CSV comprimido con gzip en
+ARCHIVE_DIR, se separa de la tabla padre (DETACH PARTITION) y se elimina.
+También crea por adelantado las particiones de los próximos meses, así que
+conviene ejecutarlo a diario (cron). Si alguna vez no se ejecutó a tiempo y
+hay filas en las particiones DEFAULT, primero las mueve a su partición mensual.
+
+Ejemplo:
+    python scripts/retention.py --dry-run
+"""
+import argparse
+import asyncio
+import gzip
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.utils.config import settings
+from app.utils.partitions import (
+    PARTITIONED_TABLES,
+    add_months,
+    default_months,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+    move_default_rows,
+    partition_name
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Archive and drop expired monthly partitions")
+    parser.add_argument("--retention-months", type=int, default=settings.RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=settings.ARCHIVE_DIR)
+    parser.add_argument("--keep-detached", action="store_true", help="Detach partitions but do not drop them")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the partitions that would be archived")
+    return parser.parse_args()
+
+async def archive_partition(conn, name: str, archive_dir: str) -> str:
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    raw = await conn.get_raw_connection()
+
+    with gzip.open(path, "wb") as archive:
+        async def write_chunk(chunk: bytes):
+            archive.write(chunk)
+
+        await raw.driver_connection.copy_from_table(name, output=write_chunk, format="csv", header=True)
+    return path
+
+async def run(args):
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -args.retention_months)
+    os.makedirs(args.archive_dir, exist_ok=True)
+
+    async with engine.begin() as conn:
+        await ensure_partitions(conn, settings.PARTITION_MONTHS_AHEAD)
+
+    for table in PARTITIONED_TABLES:
+        async with engine.connect() as conn:
+            months = await default_months(conn, table)
+
+        # Filas en la DEFAULT: a su partición (que luego se archiva si ya venció)
+        for month in months:
+            name = partition_name(table, month)
+            if args.dry_run:
+                print(f"Would move {table}_default rows into {name}")
+                continue
+
+            async with engine.begin() as conn:
+                moved = await move_default_rows(conn, table, month)
+            print(f"Moved {moved} rows from {table}_default into {name}")
+
+        async with engine.connect() as conn:
+            partitions = await list_partitions(conn, table)
+
+        for name, month in partitions:
+            if month >= cutoff:
+                continue
+
+            if args.dry_run:
+                print(f"Would archive {name}")
+                continue
+
+            # Una transacción por partición: si algo falla, la partición sigue adjunta
+            async with engine.begin() as conn:
+                path = await archive_partition(conn, name, args.archive_dir)
+                await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                if not args.keep_detached:
+                    await conn.execute(text(f"DROP TABLE {name}"))
+            print(f"Archived {name} to {path}")
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))